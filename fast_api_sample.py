@@ -1,42 +1,116 @@
-from fastapi import FastAPI, HTTPException, Path
+from fastapi import FastAPI, HTTPException, Path, Request, Depends
 from fastapi.encoders import jsonable_encoder
-from pydantic import BaseModel
-from typing import Literal, Optional
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, ConfigDict, Field, TypeAdapter
+from typing import Literal
 from uuid import uuid4
+from functools import cached_property
+from decimal import Decimal
 from mangum import Mangum
+from contextlib import AsyncExitStack
+from abc import ABC, abstractmethod
+from aiobotocore.config import AioConfig
+from cachetools import TTLCache
 import os
-import json
+import orjson
 import random
-import boto3
+import asyncio
+import aioboto3
 import botocore
+import redis.asyncio as aioredis
 
 BOOKS_FILE = "books.json"
-
-app = FastAPI()
+BOOKS_TABLE = "Books"
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# "s3" keeps the whole collection in one JSON file, "dynamodb" and "redis" store one entry per book
+BOOKSTORE_BACKEND = os.getenv("BOOKSTORE_BACKEND", "s3")
+# Size and lifetime (seconds) of the per-process cache of books read from DynamoDB
+READ_CACHE_SIZE = 10_000
+READ_CACHE_TTL = 60
+# Seconds to wait after a mutation before the collection is written back to S3
+FLUSH_DELAY = 0.5
+# How many times a flush reloads and retries after another writer changed the file
+MAX_SAVE_RETRIES = 3
+# Size in bytes at which GET /books sends the JSON it has built so far
+STREAM_CHUNK_SIZE = 64 * 1024
+# Largest streamed book list, in bytes, that is also kept as the cached GET /books payload
+STREAM_CACHE_LIMIT = 1024 * 1024
+
+app = FastAPI(default_response_class=ORJSONResponse)
 handler = Mangum(app)
 
+# One session and one client per service are shared by the whole process, so credentials and
+# endpoint config are resolved once and the HTTPS connections stay pooled between calls.
+# A client can be used by many concurrent tasks, like a boto3 client across threads.
+_AWS_SESSION = aioboto3.Session()
+# The pool is sized for many concurrent per-book DynamoDB calls. Idle pooled connections
+# are kept for 30 s instead of aiobotocore's 12 s so that closely spaced requests (or
+# Lambda invocations) reuse them; a connection the server already dropped is retried.
+_AWS_CONFIG = AioConfig(
+    max_pool_connections=100,
+    connect_timeout=2,
+    read_timeout=10,
+    retries={"max_attempts": 5, "mode": "adaptive"},
+    connector_args={"keepalive_timeout": 30}
+)
+_AWS_STACK = AsyncExitStack()
+_S3 = None
+_DYNAMODB = None
+
+# A private generator, so picking random books doesn't share state with the global random module
+_RANDOM = random.Random()
+
+async def _get_s3():
+    """
+    Returns the shared S3 client, creating it on first use.
+
+    The client is intentionally never closed: Mangum runs the lifespan around
+    every Lambda invocation, and closing it there would drop the pooled connections.
+
+    Returns:
+        The aioboto3 S3 client.
+    """
+    global _S3
+    if _S3 is None:
+        _S3 = await _AWS_STACK.enter_async_context(_AWS_SESSION.client("s3", config=_AWS_CONFIG))
+    return _S3
+
+async def _get_dynamodb():
+    """
+    Returns the shared DynamoDB resource, creating it on first use.
+
+    Returns:
+        The aioboto3 DynamoDB service resource.
+    """
+    global _DYNAMODB
+    if _DYNAMODB is None:
+        _DYNAMODB = await _AWS_STACK.enter_async_context(_AWS_SESSION.resource("dynamodb", config=_AWS_CONFIG))
+    return _DYNAMODB
+
 # To inherit from Base Model which is used to serialize and deserialize object to Json and vice versa
 class Book(BaseModel):
     """
     Represents a book with its attributes.
 
+    Books are immutable, so their dictionary representation is computed once and cached.
+
     Attributes:
         name (str): The name of the book.
         genre (Literal["fiction", "romance", "comedy", "adventure", "self-improvement", "drama"]): The genre of the book.
         price (float): The price of the book.
-        book_id (Optional[str]): The unique identifier of the book. Defaults to a randomly generated UUID.
+        book_id (str): The unique identifier of the book. Defaults to a newly generated UUID for each book.
     """
     name: str
     genre: Literal["fiction", "romance", "comedy", "adventure", "self-improvement", "drama"]
     price: float
-    book_id: Optional[str] = uuid4().hex
+    book_id: str = Field(default_factory=lambda: uuid4().hex)
 
-    def to_dict(self):
-        """
-        Converts the Book object to a dictionary representation.
+    model_config = ConfigDict(frozen=True)
 
-        Returns:
-            dict: A dictionary containing the book's attributes.
+    @cached_property
+    def as_dict(self):
+        """
+        The cached dictionary representation of the book; treat it as read-only.
         """
         return {
             "name": self.name,
@@ -45,13 +119,175 @@ class Book(BaseModel):
             "book_id": self.book_id
         }
 
-class BookStore:
+    def __copy__(self):
+        """
+        Copies the book without its cached as_dict, which would still describe this book
+        after model_copy(update=...).
+        """
+        copied = super().__copy__()
+        copied.__dict__.pop("as_dict", None)
+        return copied
+
+    def __deepcopy__(self, memo=None):
+        """
+        Deep-copies the book without its cached as_dict, like __copy__.
+        """
+        copied = super().__deepcopy__(memo)
+        copied.__dict__.pop("as_dict", None)
+        return copied
+
+    def to_dict(self):
+        """
+        Converts the Book object to a dictionary representation.
+
+        Returns:
+            dict: A dictionary containing the book's attributes.
+        """
+        return self.as_dict
+
+# Serializes a whole list of books in one pass inside pydantic-core, without building a dict per book
+_BOOK_LIST_ADAPTER = TypeAdapter(list[Book])
+
+class BaseBookStore(ABC):
     """
-    Manages a collection of books stored in a JSON file.
+    The interface the routes use, implemented by the S3, DynamoDB and Redis stores.
+
+    Lookups and changes raise HTTPException for missing or duplicate books, and
+    return the dictionaries the routes send back.
+    """
+    @classmethod
+    @abstractmethod
+    async def create(cls, location:str):
+        """
+        Creates a store connected to its backend.
+
+        Args:
+            location (str): Where the books live (file, table name or server URL).
+
+        Returns:
+            BaseBookStore: The store, ready to use.
+        """
+
+    @abstractmethod
+    async def get_all_books(self):
+        """
+        Returns a list of all books.
+
+        Returns:
+            list: A list of Book objects.
+        """
+
+    @abstractmethod
+    async def get_book_by_id(self, book_id:str):
+        """
+        Retrieves a book by its ID.
+
+        Args:
+            book_id (str): The ID of the book to retrieve.
+
+        Returns:
+            dict: A dictionary representation of the book.
+        """
+
+    @abstractmethod
+    async def random_book(self):
+        """
+        Picks a random book.
+
+        Returns:
+            dict: A dictionary representation of the book.
+        """
+
+    @abstractmethod
+    async def get_book_by_index(self, index: int):
+        """
+        Retrieves a book by its index.
+
+        Args:
+            index (int): The index of the book to retrieve.
+
+        Returns:
+            dict: A dictionary representation of the book.
+        """
+
+    @abstractmethod
+    async def add_book(self, book: Book):
+        """
+        Adds a new book.
+
+        Args:
+            book (Book): The book object to add.
+
+        Returns:
+            dict: A dictionary containing the book's ID.
+        """
+
+    @abstractmethod
+    async def update_book(self, book_id: str, update_book: Book):
+        """
+        Updates an existing book.
+
+        Args:
+            book_id (str): The ID of the book to update.
+            update_book (Book): The updated book object.
+
+        Returns:
+            dict: A dictionary containing the updated book and its ID.
+        """
+
+    @abstractmethod
+    async def delete_book(self, book_id: str):
+        """
+        Deletes a book.
+
+        Args:
+            book_id (str): The ID of the book to delete.
+
+        Returns:
+            dict: A dictionary containing a success message.
+        """
+
+    @abstractmethod
+    async def serialized_list(self) -> bytes:
+        """
+        Serializes all books to JSON.
+
+        Returns:
+            bytes: The JSON representation of all books.
+        """
+
+    @abstractmethod
+    def iter_serialized(self):
+        """
+        Serializes all books to a JSON array in chunks, for streaming.
+
+        Returns:
+            An async iterator of bytes.
+        """
+
+    async def flush(self):
+        """
+        Writes any changes that are still buffered; stores that write immediately have nothing to do.
+        """
+
+class BookStore(BaseBookStore):
+    """
+    Manages a collection of books stored as one JSON file in S3.
+
+    Mutations only update the in-memory collection and mark it dirty; the
+    collection is written back to S3 by a debounced background flush, so
+    several back-to-back writes end up in a single put_object.
+
+    Writes are conditional on the ETag of the last version read or written.
+    If another process changed the file in the meantime, the store reloads
+    it, re-applies its pending changes on top and retries.
+
+    Use BookStore.create() to get a store with its books loaded from S3.
 
     Attributes:
         book_file (str): The path to the JSON file containing the book data.
         books (dict): A dictionary storing the books, keyed by their book_id.
+        _order (list[str]): The book_ids in insertion order, used for index lookups.
     """
     def __init__(self, book_file:str):
         """
@@ -61,9 +297,33 @@ class BookStore:
             book_file (str): The path to the JSON file containing the book data.
         """
         self.book_file = book_file
-        self.books = self._load_books()
-    
-    def _load_books(self):
+        self.books = {}
+        self._order: list[str] = []
+        self._books_json_cache: bytes | None = None
+        # Bumped by every change, so a streamed list is only cached if nothing changed meanwhile
+        self._version = 0
+        self._etag: str | None = None
+        self._pending: list[tuple[str, Book | str]] = []
+        self._flush_task = None
+        self._flush_lock = asyncio.Lock()
+
+    @classmethod
+    async def create(cls, book_file:str):
+        """
+        Creates a BookStore and loads its books from S3.
+
+        Args:
+            book_file (str): The path to the JSON file containing the book data.
+
+        Returns:
+            BookStore: The store with its books loaded.
+        """
+        store = cls(book_file)
+        store.books = await store._load_books()
+        store._order = list(store.books)
+        return store
+
+    async def _load_books(self):
         """
         Loads books from the JSON file into the books dictionary.
 
@@ -72,30 +332,27 @@ class BookStore:
         """
         books = {}
 
-        s3 = boto3.client("s3")
-
         try:
-            s3.head_object(Bucket="fast-api-storage", Key=self.book_file)
+            # A missing key surfaces as NoSuchKey on the GET itself, so no HEAD round trip is needed
+            s3 = await _get_s3()
+            s3_clientobj = await s3.get_object(Bucket='fast-api-storage', Key=self.book_file)
             print(f"Key: '{self.book_file}' found!")
-            s3_clientobj = s3.get_object(Bucket='fast-api-storage', Key=self.book_file)
-            s3_clientdata = s3_clientobj['Body'].read().decode('utf-8')
-            data = json.loads(s3_clientdata)
+            self._etag = s3_clientobj["ETag"]
+            s3_clientdata = await s3_clientobj['Body'].read()
+            data = orjson.loads(s3_clientdata)
 
+            # The stored books were validated when they were written, so skip re-validating them
             for book_data in data:
-                book = Book(
-                    name=book_data["name"],
-                    genre=book_data["genre"],
-                    price=book_data["price"],
-                    book_id=book_data["book_id"]
-                )
+                book = Book.model_construct(**book_data)
                 books[book.book_id] = book
             
             return books
 
 
         except botocore.exceptions.ClientError as e:
-            if e.response["Error"]["Code"] == "404":
+            if e.response["Error"]["Code"] in ("NoSuchKey", "404"):
                 print(f"Key: '{self.book_file}' does not exist!")
+                self._etag = None
                 return books
             else:
                 print("Something else went wrong")
@@ -122,7 +379,7 @@ class BookStore:
         # return books
 
 
-    def get_all_books(self):
+    async def get_all_books(self):
         """
         Returns a list of all books in the bookstore.
 
@@ -131,7 +388,7 @@ class BookStore:
         """
         return list(self.books.values())
     
-    def get_book_by_id(self, book_id:str):
+    async def get_book_by_id(self, book_id:str):
         """
         Retrieves a book by its ID.
 
@@ -150,7 +407,22 @@ class BookStore:
         else:
             raise HTTPException(404, f"Book ID {book_id} not found in database.")
 
-    def get_book_by_index(self, index: int):
+    async def random_book(self):
+        """
+        Picks a random book from the bookstore.
+
+        Returns:
+            dict: A dictionary representation of the book.
+
+        Raises:
+            HTTPException: If the bookstore is empty.
+        """
+        if self._order:
+            return self.books[self._order[_RANDOM.randrange(len(self._order))]].to_dict()
+        else:
+            raise HTTPException(404, "No books in database.")
+
+    async def get_book_by_index(self, index: int):
         """
         Retrieves a book by its index in the bookstore.
 
@@ -163,12 +435,12 @@ class BookStore:
         Raises:
             HTTPException: If the index is out of range.
         """
-        if 0 <= index < len(self.books):
-            return list(self.books.values())[index].to_dict() 
+        if 0 <= index < len(self._order):
+            return self.books[self._order[index]].to_dict()
         else:
-            raise HTTPException(status_code=404, detail=f"book index {index} out of range ({len(self.books)})")
+            raise HTTPException(status_code=404, detail=f"book index {index} out of range ({len(self._order)})")
 
-    def add_book(self, book: Book):
+    async def add_book(self, book: Book):
         """
         Adds a new book to the bookstore.
 
@@ -177,13 +449,18 @@ class BookStore:
 
         Returns:
             dict: A dictionary containing the book's ID.
+
+        Raises:
+            HTTPException: If a book with the same ID already exists.
         """
-        book.book_id = uuid4().hex
+        if book.book_id in self.books:
+            raise HTTPException(409, f"Book ID {book.book_id} already exists in database.")
         self.books[book.book_id] = book
-        self._save_books()
+        self._order.append(book.book_id)
+        self._save_books(("add", book))
         return {"book-id": book.book_id}
     
-    def update_book(self, book_id: str, update_book: Book):
+    async def update_book(self, book_id: str, update_book: Book):
         """
         Updates an existing book in the bookstore.
 
@@ -198,13 +475,16 @@ class BookStore:
             HTTPException: If the book with the given ID is not found.
         """
         if book_id in self.books:
-            self.books[book_id] = update_book
-            self._save_books()
+            update_book = update_book.model_copy(update={"book_id": book_id})
+            # An identical update (e.g. a client retry) doesn't need to re-upload the collection
+            if self.books[book_id].to_dict() != update_book.to_dict():
+                self.books[book_id] = update_book
+                self._save_books(("update", update_book))
             return {"book": update_book.to_dict(), "book-id": book_id}
         else:
             raise HTTPException(404, f"Book ID {book_id} not found in database.")
 
-    def delete_book(self, book_id: str):
+    async def delete_book(self, book_id: str):
         """
         Deletes a book from the bookstore.
 
@@ -219,37 +499,803 @@ class BookStore:
         """
         if book_id in self.books:
             del self.books[book_id]
-            self._save_books()
+            self._order.remove(book_id)
+            self._save_books(("delete", book_id))
             return {"message": "The book has been deleted"}
         else:
             raise HTTPException(404, f"Book ID {book_id} not found in database.")
 
-    def _save_books(self):
+    def _save_books(self, op: tuple[str, Book | str]):
+        """
+        Records a change and schedules a debounced write back to S3.
+
+        Must be called from a running event loop.
+
+        Args:
+            op (tuple): The change that was applied, ("add" | "update", Book) or ("delete", book_id).
+        """
+        self._books_json_cache = None
+        self._version += 1
+        self._pending.append(op)
+
+        loop = asyncio.get_running_loop()
+        if self._flush_task is None or self._flush_task.done() or self._flush_task.get_loop() is not loop:
+            self._flush_task = loop.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        """
+        Waits for FLUSH_DELAY seconds so that further mutations are batched, then flushes.
+
+        Keeps flushing until no changes are pending, so changes made while a
+        flush was in progress are not left behind.
         """
-        Saves the books dictionary to the JSON file.
+        while self._pending:
+            await asyncio.sleep(FLUSH_DELAY)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"Flushing '{self.book_file}' failed: {e}")
+                return
+
+    async def flush(self):
+        """
+        Writes the books to S3 if they changed since the last flush.
+
+        Raises:
+            botocore.exceptions.ClientError: If the write still conflicts after MAX_SAVE_RETRIES reloads.
+        """
+        async with self._flush_lock:
+            if not self._pending:
+                return
+
+            ops, self._pending = self._pending, []
+            try:
+                for attempt in range(MAX_SAVE_RETRIES + 1):
+                    try:
+                        await self._write_books(await self.serialized_list())
+                        return
+                    except botocore.exceptions.ClientError as e:
+                        if e.response["Error"]["Code"] not in ("PreconditionFailed", "ConditionalRequestConflict") or attempt == MAX_SAVE_RETRIES:
+                            raise
+                    print(f"Key: '{self.book_file}' was changed by another writer, reloading")
+                    books = await self._load_books()
+                    # Changes made while the write or the reload were in flight are replayed too;
+                    # collect them only now, since the reload itself is an await
+                    ops, self._pending = ops + self._pending, []
+                    self._replay(books, ops)
+            except Exception:
+                self._pending = ops + self._pending
+                raise
+
+    def _replay(self, books: dict, ops: list[tuple[str, Book | str]]):
+        """
+        Re-applies pending changes on top of freshly loaded books and makes them current.
+
+        Args:
+            books (dict): The books loaded from S3.
+            ops (list): The pending changes, oldest first.
+        """
+        order = list(books)
+        for kind, value in ops:
+            if kind == "add" and value.book_id not in books:
+                order.append(value.book_id)
+                books[value.book_id] = value
+            elif kind == "update" and value.book_id in books:
+                books[value.book_id] = value
+            elif kind == "delete" and value in books:
+                del books[value]
+                order.remove(value)
+
+        self.books = books
+        self._order = order
+        self._books_json_cache = None
+        self._version += 1
+
+    async def serialized_list(self) -> bytes:
+        """
+        Serializes the books dictionary to JSON.
+
+        The result is cached until the next mutation, so repeated flushes and
+        GET /books requests share it.
+
+        Returns:
+            bytes: The JSON representation of all books.
+        """
+        if self._books_json_cache is None:
+            self._books_json_cache = _BOOK_LIST_ADAPTER.dump_json(list(self.books.values()))
+        return self._books_json_cache
+
+    async def iter_serialized(self):
+        """
+        Serializes the books to a JSON array in chunks of about STREAM_CHUNK_SIZE bytes.
+
+        If the serialized list is already cached it is sent as is; otherwise
+        the books are serialized as they are sent, so the first bytes go out
+        before the whole payload exists. Books deleted while streaming are skipped.
+
+        Lists up to STREAM_CACHE_LIMIT bytes are also kept and become the cached
+        list once the last chunk is sent (unless the books changed meanwhile), at
+        the cost of holding them twice while joining. Larger lists only ever hold
+        one chunk and are serialized again on every request until a flush caches them.
+
+        Yields:
+            bytes: The next part of the JSON array.
+        """
+        if self._books_json_cache is not None:
+            yield self._books_json_cache
+            return
+
+        version = self._version
+        chunks = []
+        kept = 0
+        chunk = bytearray(b"[")
+        first = True
+        for book_id in tuple(self._order):
+            book = self.books.get(book_id)
+            if book is None:
+                continue
+            if not first:
+                chunk += b","
+            chunk += orjson.dumps(book.to_dict())
+            first = False
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                piece = bytes(chunk)
+                chunk.clear()
+                chunks, kept = self._keep_chunk(chunks, kept, piece)
+                yield piece
+        chunk += b"]"
+        piece = bytes(chunk)
+        chunks, kept = self._keep_chunk(chunks, kept, piece)
+        yield piece
+
+        if chunks is not None and version == self._version:
+            self._books_json_cache = b"".join(chunks)
+
+    @staticmethod
+    def _keep_chunk(chunks, kept, piece):
+        """
+        Keeps a streamed chunk for the cache, or gives up once STREAM_CACHE_LIMIT is exceeded.
+
+        Args:
+            chunks (list | None): The chunks kept so far, or None once the list is too large.
+            kept (int): The number of bytes kept so far.
+            piece (bytes): The chunk that was just streamed.
+
+        Returns:
+            tuple: The updated chunks and kept byte count.
+        """
+        if chunks is None or kept + len(piece) > STREAM_CACHE_LIMIT:
+            return None, kept
+        chunks.append(piece)
+        return chunks, kept + len(piece)
+
+    async def _write_books(self, body):
+        """
+        Saves the serialized books to the JSON file.
+
+        The write only succeeds if the file still has the ETag we last saw
+        (or still doesn't exist), and the new ETag is remembered.
+
+        Args:
+            body (bytes): The JSON representation of all books.
+
+        Raises:
+            botocore.exceptions.ClientError: If the file was changed by another writer.
         """
         # with open(self.book_file, 'w') as f:
         #     json.dump([book.to_dict() for book in self.books.values()], f)
 
-        s3 = boto3.client("s3")
-
         try:
-            s3.put_object(
+            s3 = await _get_s3()
+            if self._etag is None:
+                condition = {"IfNoneMatch": "*"}
+            else:
+                condition = {"IfMatch": self._etag}
+            response = await s3.put_object(
                 Bucket="fast-api-storage",
                 Key=self.book_file,
-                Body=json.dumps([book.to_dict() for book in self.books.values()])
+                Body=body,
+                **condition
             )
+            self._etag = response["ETag"]
 
         except botocore.exceptions.ClientError as e:
-            if e.response["Error"]["Code"] == "404":
+            if e.response["Error"]["Code"] in ("PreconditionFailed", "ConditionalRequestConflict"):
+                raise
+            elif e.response["Error"]["Code"] == "404":
                 print(f"Key: '{self.book_file}' does not exist!")
             else:
                 print("Something else went wrong")
                 raise
 
 
+class DynamoBookStore(BaseBookStore):
+    """
+    Manages a collection of books stored in a DynamoDB table keyed by book_id.
+
+    Every operation goes straight to the table, so a change writes a single item
+    instead of the whole collection and nothing is kept in memory. Listing (and
+    indexing, which follows scan order) scans the table.
+
+    Books looked up by ID are kept in a small TTL cache. Changes made through
+    this store evict their entry; changes made by other processes show up
+    once the entry expires.
+
+    Attributes:
+        table_name (str): The name of the DynamoDB table.
+    """
+    def __init__(self, table_name:str):
+        """
+        Initializes the DynamoBookStore with the specified table.
+
+        Args:
+            table_name (str): The name of the DynamoDB table.
+        """
+        self.table_name = table_name
+        self._table = None
+        self._read_cache = TTLCache(maxsize=READ_CACHE_SIZE, ttl=READ_CACHE_TTL)
+        # Bumped by every write, so a read that overlapped a write doesn't cache what it read
+        self._write_count = 0
+
+    @classmethod
+    async def create(cls, table_name:str):
+        """
+        Creates a DynamoBookStore connected to its table.
+
+        Args:
+            table_name (str): The name of the DynamoDB table.
+
+        Returns:
+            DynamoBookStore: The store, ready to use.
+        """
+        store = cls(table_name)
+        store._table = await (await _get_dynamodb()).Table(table_name)
+        return store
+
+    @staticmethod
+    def _to_item(book: Book):
+        """
+        Converts a book to a DynamoDB item; DynamoDB numbers have to be Decimals.
+
+        Args:
+            book (Book): The book to convert.
+
+        Returns:
+            dict: The item to store.
+        """
+        return {**book.to_dict(), "price": Decimal(str(book.price))}
+
+    @staticmethod
+    def _from_item(item: dict):
+        """
+        Converts a DynamoDB item back to a book.
+
+        Args:
+            item (dict): The stored item.
+
+        Returns:
+            Book: The book, built without re-validating the stored data.
+        """
+        return Book.model_construct(
+            name=item["name"],
+            genre=item["genre"],
+            price=float(item["price"]),
+            book_id=item["book_id"]
+        )
+
+    async def get_all_books(self):
+        """
+        Returns a list of all books in the table.
+
+        Returns:
+            list: A list of Book objects.
+        """
+        books = []
+        async for page in self._scan_pages():
+            books.extend(page)
+        return books
+
+    async def _scan_pages(self):
+        """
+        Scans the table one page at a time.
+
+        Yields:
+            list: The Book objects of the next page.
+        """
+        kwargs = {}
+        while True:
+            response = await self._table.scan(**kwargs)
+            yield [self._from_item(item) for item in response["Items"]]
+            if "LastEvaluatedKey" not in response:
+                return
+            kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    async def get_book_by_id(self, book_id:str):
+        """
+        Retrieves a book by its ID.
+
+        Args:
+            book_id (str): The ID of the book to retrieve.
+
+        Returns:
+            dict: A dictionary representation of the book.
+
+        Raises:
+            HTTPException: If the book with the given ID is not found.
+        """
+        book = self._read_cache.get(book_id)
+        if book is None:
+            write_count = self._write_count
+            response = await self._table.get_item(Key={"book_id": book_id})
+            if "Item" not in response:
+                raise HTTPException(404, f"Book ID {book_id} not found in database.")
+            book = self._from_item(response["Item"])
+            if write_count == self._write_count:
+                self._read_cache[book_id] = book
+        return book.to_dict()
+
+    def _evict(self, book_id: str):
+        """
+        Drops a book from the read cache once a write to it has finished.
 
-bookstore = BookStore(BOOKS_FILE)
+        Evicting only after the write means a lookup running during the write
+        can't put the old version back into the cache.
+
+        Args:
+            book_id (str): The ID of the book that was written.
+        """
+        self._write_count += 1
+        self._read_cache.pop(book_id, None)
+
+    async def random_book(self):
+        """
+        Picks a random book from the table.
+
+        Returns:
+            dict: A dictionary representation of the book.
+
+        Raises:
+            HTTPException: If the table is empty.
+        """
+        books = await self.get_all_books()
+        if books:
+            return _RANDOM.choice(books).to_dict()
+        else:
+            raise HTTPException(404, "No books in database.")
+
+    async def get_book_by_index(self, index: int):
+        """
+        Retrieves a book by its index in the table's scan order.
+
+        Args:
+            index (int): The index of the book to retrieve.
+
+        Returns:
+            dict: A dictionary representation of the book.
+
+        Raises:
+            HTTPException: If the index is out of range.
+        """
+        books = await self.get_all_books()
+        if 0 <= index < len(books):
+            return books[index].to_dict()
+        else:
+            raise HTTPException(status_code=404, detail=f"book index {index} out of range ({len(books)})")
+
+    async def add_book(self, book: Book):
+        """
+        Adds a new book to the table.
+
+        Args:
+            book (Book): The book object to add.
+
+        Returns:
+            dict: A dictionary containing the book's ID.
+
+        Raises:
+            HTTPException: If a book with the same ID already exists.
+        """
+        try:
+            await self._table.put_item(Item=self._to_item(book), ConditionExpression="attribute_not_exists(book_id)")
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise HTTPException(409, f"Book ID {book.book_id} already exists in database.")
+            raise
+        return {"book-id": book.book_id}
+
+    async def update_book(self, book_id: str, update_book: Book):
+        """
+        Updates an existing book in the table.
+
+        Args:
+            book_id (str): The ID of the book to update.
+            update_book (Book): The updated book object.
+
+        Returns:
+            dict: A dictionary containing the updated book and its ID.
+
+        Raises:
+            HTTPException: If the book with the given ID is not found.
+        """
+        update_book = update_book.model_copy(update={"book_id": book_id})
+        try:
+            await self._table.put_item(Item=self._to_item(update_book), ConditionExpression="attribute_exists(book_id)")
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise HTTPException(404, f"Book ID {book_id} not found in database.")
+            raise
+        finally:
+            self._evict(book_id)
+        return {"book": update_book.to_dict(), "book-id": book_id}
+
+    async def delete_book(self, book_id: str):
+        """
+        Deletes a book from the table.
+
+        Args:
+            book_id (str): The ID of the book to delete.
+
+        Returns:
+            dict: A dictionary containing a success message.
+
+        Raises:
+            HTTPException: If the book with the given ID is not found.
+        """
+        try:
+            await self._table.delete_item(Key={"book_id": book_id}, ConditionExpression="attribute_exists(book_id)")
+        except botocore.exceptions.ClientError as e:
+            if e.response["Error"]["Code"] == "ConditionalCheckFailedException":
+                raise HTTPException(404, f"Book ID {book_id} not found in database.")
+            raise
+        finally:
+            self._evict(book_id)
+        return {"message": "The book has been deleted"}
+
+    async def serialized_list(self) -> bytes:
+        """
+        Serializes all books in the table to JSON.
+
+        Returns:
+            bytes: The JSON representation of all books.
+        """
+        return _BOOK_LIST_ADAPTER.dump_json(await self.get_all_books())
+
+    async def iter_serialized(self):
+        """
+        Serializes the books to a JSON array one scan page at a time.
+
+        Yields:
+            bytes: The next part of the JSON array.
+        """
+        yield b"["
+        first = True
+        async for books in self._scan_pages():
+            if books:
+                body = _BOOK_LIST_ADAPTER.dump_json(books)[1:-1]
+                yield body if first else b"," + body
+                first = False
+        yield b"]"
+
+
+class RedisBookStore(BaseBookStore):
+    """
+    Manages a collection of books stored in Redis.
+
+    Each book is a hash under "book:<book_id>" and the list "books:order" keeps
+    the book_ids in insertion order. All state lives in Redis, so every worker
+    and container sees the same books and a change touches a single book.
+
+    Attributes:
+        redis_url (str): The URL of the Redis server.
+    """
+    ORDER_KEY = "books:order"
+    # How many books are fetched per pipelined round trip when listing
+    PAGE_SIZE = 500
+
+    def __init__(self, redis_url:str):
+        """
+        Initializes the RedisBookStore with the specified server.
+
+        Args:
+            redis_url (str): The URL of the Redis server.
+        """
+        self.redis_url = redis_url
+        self._r = aioredis.from_url(redis_url, decode_responses=True)
+
+    @classmethod
+    async def create(cls, redis_url:str):
+        """
+        Creates a RedisBookStore and checks that the server is reachable.
+
+        Args:
+            redis_url (str): The URL of the Redis server.
+
+        Returns:
+            RedisBookStore: The store, ready to use.
+        """
+        store = cls(redis_url)
+        await store._r.ping()
+        return store
+
+    @staticmethod
+    def _key(book_id: str):
+        """
+        Returns the Redis key of a book's hash.
+
+        Args:
+            book_id (str): The ID of the book.
+
+        Returns:
+            str: The key of the hash.
+        """
+        return f"book:{book_id}"
+
+    @staticmethod
+    def _from_hash(data: dict):
+        """
+        Converts a stored hash back to a book.
+
+        Args:
+            data (dict): The fields of the hash.
+
+        Returns:
+            Book: The book, built without re-validating the stored data.
+        """
+        return Book.model_construct(
+            name=data["name"],
+            genre=data["genre"],
+            price=float(data["price"]),
+            book_id=data["book_id"]
+        )
+
+    async def _get_books(self, book_ids: list[str]):
+        """
+        Fetches several books in one pipelined round trip, skipping ones deleted in the meantime.
+
+        Args:
+            book_ids (list[str]): The IDs of the books to fetch.
+
+        Returns:
+            list: The Book objects found, in the order of book_ids.
+        """
+        async with self._r.pipeline(transaction=False) as pipe:
+            for book_id in book_ids:
+                pipe.hgetall(self._key(book_id))
+            results = await pipe.execute()
+        return [self._from_hash(data) for data in results if data]
+
+    async def _book_pages(self):
+        """
+        Reads the books in insertion order, PAGE_SIZE at a time.
+
+        Yields:
+            list: The Book objects of the next page.
+        """
+        start = 0
+        while True:
+            book_ids = await self._r.lrange(self.ORDER_KEY, start, start + self.PAGE_SIZE - 1)
+            if not book_ids:
+                return
+            yield await self._get_books(book_ids)
+            start += self.PAGE_SIZE
+
+    async def get_all_books(self):
+        """
+        Returns a list of all books in the bookstore.
+
+        Returns:
+            list: A list of Book objects.
+        """
+        books = []
+        async for page in self._book_pages():
+            books.extend(page)
+        return books
+
+    async def get_book_by_id(self, book_id:str):
+        """
+        Retrieves a book by its ID.
+
+        Args:
+            book_id (str): The ID of the book to retrieve.
+
+        Returns:
+            dict: A dictionary representation of the book.
+
+        Raises:
+            HTTPException: If the book with the given ID is not found.
+        """
+        data = await self._r.hgetall(self._key(book_id))
+        if data:
+            return self._from_hash(data).to_dict()
+        else:
+            raise HTTPException(404, f"Book ID {book_id} not found in database.")
+
+    async def random_book(self):
+        """
+        Picks a random book from the bookstore.
+
+        Returns:
+            dict: A dictionary representation of the book.
+
+        Raises:
+            HTTPException: If the bookstore is empty.
+        """
+        count = await self._r.llen(self.ORDER_KEY)
+        if count:
+            book_id = await self._r.lindex(self.ORDER_KEY, _RANDOM.randrange(count))
+            books = await self._get_books([book_id]) if book_id is not None else []
+            if books:
+                return books[0].to_dict()
+        raise HTTPException(404, "No books in database.")
+
+    async def get_book_by_index(self, index: int):
+        """
+        Retrieves a book by its index in the bookstore.
+
+        Args:
+            index (int): The index of the book to retrieve.
+
+        Returns:
+            dict: A dictionary representation of the book.
+
+        Raises:
+            HTTPException: If the index is out of range.
+        """
+        book_id = await self._r.lindex(self.ORDER_KEY, index)
+        books = await self._get_books([book_id]) if book_id is not None else []
+        if books:
+            return books[0].to_dict()
+        else:
+            count = await self._r.llen(self.ORDER_KEY)
+            raise HTTPException(status_code=404, detail=f"book index {index} out of range ({count})")
+
+    async def add_book(self, book: Book):
+        """
+        Adds a new book to the bookstore.
+
+        Args:
+            book (Book): The book object to add.
+
+        Returns:
+            dict: A dictionary containing the book's ID.
+
+        Raises:
+            HTTPException: If a book with the same ID already exists.
+        """
+        key = self._key(book.book_id)
+
+        async def add(pipe):
+            if await pipe.exists(key):
+                raise HTTPException(409, f"Book ID {book.book_id} already exists in database.")
+            pipe.multi()
+            pipe.hset(key, mapping=book.to_dict())
+            pipe.rpush(self.ORDER_KEY, book.book_id)
+
+        await self._r.transaction(add, key)
+        return {"book-id": book.book_id}
+
+    async def update_book(self, book_id: str, update_book: Book):
+        """
+        Updates an existing book in the bookstore.
+
+        Args:
+            book_id (str): The ID of the book to update.
+            update_book (Book): The updated book object.
+
+        Returns:
+            dict: A dictionary containing the updated book and its ID.
+
+        Raises:
+            HTTPException: If the book with the given ID is not found.
+        """
+        key = self._key(book_id)
+        update_book = update_book.model_copy(update={"book_id": book_id})
+
+        async def update(pipe):
+            if not await pipe.exists(key):
+                raise HTTPException(404, f"Book ID {book_id} not found in database.")
+            pipe.multi()
+            pipe.hset(key, mapping=update_book.to_dict())
+
+        await self._r.transaction(update, key)
+        return {"book": update_book.to_dict(), "book-id": book_id}
+
+    async def delete_book(self, book_id: str):
+        """
+        Deletes a book from the bookstore.
+
+        Args:
+            book_id (str): The ID of the book to delete.
+
+        Returns:
+            dict: A dictionary containing a success message.
+
+        Raises:
+            HTTPException: If the book with the given ID is not found.
+        """
+        key = self._key(book_id)
+
+        async def delete(pipe):
+            if not await pipe.exists(key):
+                raise HTTPException(404, f"Book ID {book_id} not found in database.")
+            pipe.multi()
+            pipe.delete(key)
+            pipe.lrem(self.ORDER_KEY, 1, book_id)
+
+        await self._r.transaction(delete, key)
+        return {"message": "The book has been deleted"}
+
+    async def serialized_list(self) -> bytes:
+        """
+        Serializes all books in the bookstore to JSON.
+
+        Returns:
+            bytes: The JSON representation of all books.
+        """
+        return _BOOK_LIST_ADAPTER.dump_json(await self.get_all_books())
+
+    async def iter_serialized(self):
+        """
+        Serializes the books to a JSON array one page at a time.
+
+        Yields:
+            bytes: The next part of the JSON array.
+        """
+        yield b"["
+        first = True
+        async for books in self._book_pages():
+            if books:
+                body = _BOOK_LIST_ADAPTER.dump_json(books)[1:-1]
+                yield body if first else b"," + body
+                first = False
+        yield b"]"
+
+
+
+# The store is loaded on startup rather than at import, so importing the module
+# (cold start, test collection) doesn't wait on S3.
+app.state.bookstore = None
+
+@app.on_event("startup")
+async def load_books():
+    """
+    Loads the bookstore for the configured backend when the application starts.
+
+    Raises:
+        ValueError: If BOOKSTORE_BACKEND is not "s3", "dynamodb" or "redis".
+    """
+    # Mangum runs the lifespan on every invocation; keep the store of a warm container
+    if app.state.bookstore is None:
+        if BOOKSTORE_BACKEND == "dynamodb":
+            app.state.bookstore = await DynamoBookStore.create(BOOKS_TABLE)
+        elif BOOKSTORE_BACKEND == "redis":
+            app.state.bookstore = await RedisBookStore.create(REDIS_URL)
+        elif BOOKSTORE_BACKEND == "s3":
+            app.state.bookstore = await BookStore.create(BOOKS_FILE)
+        else:
+            raise ValueError(f"Unknown BOOKSTORE_BACKEND '{BOOKSTORE_BACKEND}', expected 's3', 'dynamodb' or 'redis'.")
+
+# Mangum runs the lifespan around every Lambda invocation, so this also
+# flushes pending writes before the invocation returns.
+@app.on_event("shutdown")
+async def flush_books():
+    """
+    Writes any pending changes before the application stops.
+    """
+    if app.state.bookstore is not None:
+        await app.state.bookstore.flush()
+
+def get_bookstore(request: Request) -> BaseBookStore:
+    """
+    Provides the application's bookstore to the route handlers.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        BaseBookStore: The store loaded on startup.
+    """
+    return request.app.state.bookstore
 
 @app.get('/hello-world')
 async def hello_world():
@@ -262,7 +1308,7 @@ async def hello_world():
     return {"messages": "HELLO World!"}
 
 @app.get("/")
-def root():
+async def root():
     """
     Returns a welcome message to the bookstore.
 
@@ -271,91 +1317,130 @@ def root():
     """
     return {"messages": "Welcome to the bookstore"}
 
-@app.get("/random-book", response_model=Book)
-def random_book():
+# The read endpoints return ORJSONResponse directly, so FastAPI skips re-validating
+# the books against a response_model; `responses` keeps the schema in the API docs.
+@app.get("/random-book", responses={200: {"model": Book}})
+async def random_book(bookstore: BaseBookStore = Depends(get_bookstore)):
     """
     Returns a random book from the bookstore.
 
+    Args:
+        bookstore (BaseBookStore): The bookstore to use.
+
     Returns:
-        Book: A random Book object.
+        ORJSONResponse: A random book.
     """
-    return random.choice(bookstore.get_all_books())
+    return ORJSONResponse(await bookstore.random_book())
 
-@app.get("/books", response_model=list[Book])
-def list_books() -> list[Book]:
+@app.get("/books", responses={200: {"model": list[Book]}})
+async def list_books(bookstore: BaseBookStore = Depends(get_bookstore)):
     """
     Returns a list of all books in the bookstore.
 
+    Args:
+        bookstore (BaseBookStore): The bookstore to use.
+
     Returns:
-        list[Book]: A list of Book objects.
+        StreamingResponse: The JSON list of all books, sent as it is serialized.
     """
-    return bookstore.get_all_books()
+    return StreamingResponse(bookstore.iter_serialized(), media_type="application/json")
 
 # request with path params http://127.0.0.1:8000/book-by-index/<param>
 # index: int -> this is a type hint
-@app.get("/books-by-index/{index}")
-def book_by_index(index: int = Path(ge=0, description="The index of item you would like to view")) -> Book:
+@app.get("/books-by-index/{index}", responses={200: {"model": Book}})
+async def book_by_index(index: int = Path(ge=0, description="The index of item you would like to view"), bookstore: BaseBookStore = Depends(get_bookstore)):
     """
     Retrieves a book by its index in the bookstore.
 
     Args:
         index (int): The index of the book to retrieve.
+        bookstore (BaseBookStore): The bookstore to use.
 
     Returns:
-        Book: The Book object at the specified index.
+        ORJSONResponse: The book at the specified index.
     """
-    return bookstore.get_book_by_index(index)
+    return ORJSONResponse(await bookstore.get_book_by_index(index))
 
 @app.post("/add-book")
-async def add_book(book: Book):
+async def add_book(book: Book, bookstore: BaseBookStore = Depends(get_bookstore)):
     """
     Adds a new book to the bookstore.
 
     Args:
         book (Book): The book object to add.
+        bookstore (BaseBookStore): The bookstore to use.
 
     Returns:
         dict: A dictionary containing the book's ID.
     """
-    return bookstore.add_book(book)
+    return await bookstore.add_book(book)
 
 @app.post("/update-book/{book_id}")
-async def update_book(book_id: str, update_book: Book):
+async def update_book(book_id: str, update_book: Book, bookstore: BaseBookStore = Depends(get_bookstore)):
     """
     Updates an existing book in the bookstore.
 
     Args:
         book_id (str): The ID of the book to update.
         update_book (Book): The updated book object.
+        bookstore (BaseBookStore): The bookstore to use.
 
     Returns:
         dict: A dictionary containing the updated book and its ID.
     """
-    return bookstore.update_book(book_id, update_book)
+    return await bookstore.update_book(book_id, update_book)
 
 # request with query parameters http://127.0.0.1:8000/get-book?book_id=<book_id>
-@app.get("/book-by-id")
-def get_book(book_id: str) -> Book:
+@app.get("/book-by-id", responses={200: {"model": Book}})
+async def get_book(book_id: str, bookstore: BaseBookStore = Depends(get_bookstore)):
     """
     Retrieves a book by its ID.
 
     Args:
         book_id (str): The ID of the book to retrieve.
+        bookstore (BaseBookStore): The bookstore to use.
 
     Returns:
-        Book: The Book object with the specified ID.
+        ORJSONResponse: The book with the specified ID.
     """
-    return bookstore.get_book_by_id(book_id)
+    return ORJSONResponse(await bookstore.get_book_by_id(book_id))
 
 @app.delete("/delete-book")
-def delete_book(book_id: str):
+async def delete_book(book_id: str, bookstore: BaseBookStore = Depends(get_bookstore)):
     """
     Deletes a book from the bookstore.
 
     Args:
         book_id (str): The ID of the book to delete.
+        bookstore (BaseBookStore): The bookstore to use.
 
     Returns:
         dict: A dictionary containing a success message.
     """
-    return bookstore.delete_book(book_id)
\ No newline at end of file
+    return await bookstore.delete_book(book_id)
+
+
+# Production entry point, e.g. on EC2 behind nginx: `python fast_api_sample.py`.
+# Each worker is a separate process. The S3 store keeps its own copy of the books per
+# process, so it only runs with a single worker; the dynamodb and redis backends share
+# state and default to 2 * CPUs + 1 workers.
+if __name__ == "__main__":
+    import uvicorn
+
+    if BOOKSTORE_BACKEND in ("dynamodb", "redis"):
+        workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() * 2 + 1))
+    else:
+        workers = int(os.getenv("WEB_CONCURRENCY", 1))
+        if workers > 1:
+            raise SystemExit("The s3 backend keeps books per process; use BOOKSTORE_BACKEND=dynamodb or redis to run more than one worker.")
+
+    uvicorn.run(
+        "fast_api_sample:app",
+        host="0.0.0.0",
+        port=8000,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        limit_concurrency=1000,
+        backlog=2048
+    )
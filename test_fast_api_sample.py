@@ -1,6 +1,11 @@
 import pytest
 from fastapi.testclient import TestClient
-from fast_api_sample import app, BookStore, Book, BOOKS_FILE
+from fast_api_sample import app, BookStore, DynamoBookStore, RedisBookStore, Book, BOOKS_FILE, get_bookstore
+from fastapi import HTTPException
+import fast_api_sample
+import botocore.exceptions
+import orjson
+import asyncio
 import json
 import os
 
@@ -13,8 +18,10 @@ def setup_module():
         json.dump([], f)
     global bookstore
     bookstore = BookStore("tests/books.json")
+    app.dependency_overrides[get_bookstore] = lambda: bookstore
 
 def teardown_module():
+    app.dependency_overrides.clear()
     # Remove the temporary books.json file
     os.remove("tests/books.json")
 
@@ -25,15 +32,22 @@ def test_get_all_books_empty():
     assert response.json() == []
 
 def test_get_all_books_populated():
-    bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0))
-    bookstore.add_book(Book(name="Book 2", genre="romance", price=15.0))
+    asyncio.run(bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0)))
+    asyncio.run(bookstore.add_book(Book(name="Book 2", genre="romance", price=15.0)))
     response = client.get("/books")
     assert response.status_code == 200
     assert len(response.json()) == 2
 
+# Test cases for the cached Book dictionary
+def test_book_copy_drops_cached_dict():
+    book = Book(name="Book 1", genre="fiction", price=1.5)
+    assert book.to_dict()["price"] == 1.5
+    assert book.model_copy(update={"price": 9.0}).to_dict()["price"] == 9.0
+    assert book.model_copy(update={"price": 9.0}, deep=True).to_dict()["price"] == 9.0
+
 # Test cases for get_book_by_id
 def test_get_book_by_id_valid():
-    book_id = bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0))["book-id"]
+    book_id = asyncio.run(bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0)))["book-id"]
     response = client.get(f"/book-by-id?book_id={book_id}")
     assert response.status_code == 200
     assert response.json()["book_id"] == book_id
@@ -44,8 +58,8 @@ def test_get_book_by_id_invalid():
 
 # Test cases for get_book_by_index
 def test_get_book_by_index_valid():
-    bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0))
-    bookstore.add_book(Book(name="Book 2", genre="romance", price=15.0))
+    asyncio.run(bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0)))
+    asyncio.run(bookstore.add_book(Book(name="Book 2", genre="romance", price=15.0)))
     response = client.get("/books-by-index/1")
     assert response.status_code == 200
     assert response.json()["name"] == "Book 2"
@@ -61,6 +75,12 @@ def test_add_book_valid():
     assert response.status_code == 200
     assert "book-id" in response.json()
 
+def test_add_book_generates_unique_ids():
+    book_data = {"name": "Book 1", "genre": "fiction", "price": 10.0}
+    first = client.post("/add-book", json=book_data).json()["book-id"]
+    second = client.post("/add-book", json=book_data).json()["book-id"]
+    assert first != second
+
 def test_add_book_invalid_genre():
     book_data = {"name": "Book 1", "genre": "invalid_genre", "price": 10.0}
     response = client.post("/add-book", json=book_data)
@@ -68,12 +88,19 @@ def test_add_book_invalid_genre():
 
 # Test cases for update_book
 def test_update_book_valid():
-    book_id = bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0))["book-id"]
+    book_id = asyncio.run(bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0)))["book-id"]
     update_book_data = {"name": "Updated Book 1", "genre": "romance", "price": 15.0}
     response = client.post(f"/update-book/{book_id}", json=update_book_data)
     assert response.status_code == 200
     assert response.json()["book"]["name"] == "Updated Book 1"
 
+def test_update_book_unchanged_skips_save():
+    book_id = asyncio.run(bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0)))["book-id"]
+    bookstore._pending.clear()
+    response = client.post(f"/update-book/{book_id}", json={"name": "Book 1", "genre": "fiction", "price": 10.0})
+    assert response.status_code == 200
+    assert bookstore._pending == []
+
 def test_update_book_invalid_id():
     update_book_data = {"name": "Updated Book 1", "genre": "romance", "price": 15.0}
     response = client.post("/update-book/invalid_id", json=update_book_data)
@@ -81,7 +108,7 @@ def test_update_book_invalid_id():
 
 # Test cases for delete_book
 def test_delete_book_valid():
-    book_id = bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0))["book-id"]
+    book_id = asyncio.run(bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0)))["book-id"]
     response = client.delete(f"/delete-book?book_id={book_id}")
     assert response.status_code == 200
     assert response.json()["message"] == "The book has been deleted"
@@ -90,10 +117,236 @@ def test_delete_book_invalid_id():
     response = client.delete("/delete-book?book_id=invalid_id")
     assert response.status_code == 404
 
+# Test cases for replaying pending changes after a conflicting write
+def test_replay_pending_changes():
+    store = BookStore("tests/books.json")
+    kept = Book(name="Remote", genre="drama", price=5.0)
+    removed = Book(name="Removed", genre="comedy", price=7.0)
+    added = Book(name="Local", genre="fiction", price=10.0)
+    store._replay({kept.book_id: kept, removed.book_id: removed}, [("add", added), ("delete", removed.book_id)])
+    assert list(store.books) == [kept.book_id, added.book_id]
+    assert store._order == [kept.book_id, added.book_id]
+
+# Test cases for streaming the book list
+def test_iter_serialized_fills_cache():
+    store = BookStore("tests/books.json")
+    store.books = {str(i): Book(name=f"Book {i}", genre="fiction", price=float(i), book_id=str(i)) for i in range(3)}
+    store._order = list(store.books)
+
+    streamed = asyncio.run(collect(store.iter_serialized()))
+    assert [book["name"] for book in orjson.loads(streamed)] == ["Book 0", "Book 1", "Book 2"]
+    assert store._books_json_cache == streamed
+
+def test_iter_serialized_skips_cache_over_limit(monkeypatch):
+    monkeypatch.setattr(fast_api_sample, "STREAM_CHUNK_SIZE", 1)
+    monkeypatch.setattr(fast_api_sample, "STREAM_CACHE_LIMIT", 100)
+    store = BookStore("tests/books.json")
+    store.books = {str(i): Book(name=f"Book {i}", genre="fiction", price=float(i), book_id=str(i)) for i in range(5)}
+    store._order = list(store.books)
+
+    streamed = asyncio.run(collect(store.iter_serialized()))
+    assert len(orjson.loads(streamed)) == 5
+    assert store._books_json_cache is None
+
+def test_iter_serialized_skips_cache_after_change(monkeypatch):
+    monkeypatch.setattr(fast_api_sample, "STREAM_CHUNK_SIZE", 1)
+    store = BookStore("tests/books.json")
+
+    async def run():
+        await store.add_book(Book(name="Book 1", genre="fiction", price=10.0))
+        await store.add_book(Book(name="Book 2", genre="romance", price=15.0))
+        chunks = store.iter_serialized()
+        await chunks.__anext__()
+        await store.delete_book(store._order[0])
+        return await collect(chunks)
+
+    asyncio.run(run())
+    assert store._books_json_cache is None
+
+# Test cases for choosing the backend
+def test_unknown_backend_is_rejected(monkeypatch):
+    monkeypatch.setattr(fast_api_sample, "BOOKSTORE_BACKEND", "dynamo")
+    monkeypatch.setattr(app.state, "bookstore", None)
+    with pytest.raises(ValueError, match="dynamo"):
+        asyncio.run(fast_api_sample.load_books())
+
+# Test cases for the S3 store, against an in-memory stand-in for the S3 client
+class FakeBody:
+    def __init__(self, data):
+        self.data = data
+
+    async def read(self):
+        return self.data
+
+class FakeS3:
+    def __init__(self, books=None):
+        self.body = None if books is None else orjson.dumps([book.to_dict() for book in books])
+        self.etag = None if books is None else '"v0"'
+        self.get_error = None
+        self.puts = []
+
+    def replace(self, books):
+        # Another writer uploading a new version of the file
+        self.body = orjson.dumps([book.to_dict() for book in books])
+        self.etag = f'"other-{len(self.puts)}"'
+
+    async def get_object(self, Bucket, Key):
+        if self.get_error is not None:
+            raise botocore.exceptions.ClientError({"Error": {"Code": self.get_error}}, "GetObject")
+        if self.body is None:
+            raise botocore.exceptions.ClientError({"Error": {"Code": "NoSuchKey"}}, "GetObject")
+        return {"ETag": self.etag, "Body": FakeBody(self.body)}
+
+    async def put_object(self, Bucket, Key, Body, **conditions):
+        self.puts.append(conditions)
+        if conditions.get("IfNoneMatch") == "*" and self.body is not None or \
+                "IfMatch" in conditions and conditions["IfMatch"] != self.etag:
+            raise botocore.exceptions.ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+        self.body = Body
+        self.etag = f'"v{len(self.puts)}"'
+        return {"ETag": self.etag}
+
+@pytest.fixture
+def fake_s3(monkeypatch):
+    def install(books=None):
+        s3 = FakeS3(books)
+
+        async def get_s3():
+            return s3
+
+        monkeypatch.setattr(fast_api_sample, "_get_s3", get_s3)
+        return s3
+
+    return install
+
+def test_s3_write_is_conditional_on_loaded_etag(fake_s3):
+    s3 = fake_s3([Book(name="Remote", genre="drama", price=5.0)])
+
+    async def run():
+        store = await BookStore.create("tests/books.json")
+        assert store._etag == '"v0"'
+        await store.add_book(Book(name="Local", genre="fiction", price=10.0))
+        await store.flush()
+        return store
+
+    store = asyncio.run(run())
+    assert s3.puts == [{"IfMatch": '"v0"'}]
+    assert store._etag == s3.etag == '"v1"'
+
+def test_s3_first_write_requires_missing_file(fake_s3):
+    s3 = fake_s3()
+
+    async def run():
+        store = await BookStore.create("tests/books.json")
+        await store.add_book(Book(name="Local", genre="fiction", price=10.0))
+        await store.flush()
+        return store
+
+    store = asyncio.run(run())
+    assert s3.puts == [{"IfNoneMatch": "*"}]
+    assert store._etag == '"v1"'
+
+def test_s3_missing_file_loads_empty_and_resets_etag(fake_s3):
+    fake_s3()
+    store = BookStore("tests/books.json")
+    store._etag = '"old"'
+    assert asyncio.run(store._load_books()) == {}
+    assert store._etag is None
+
+def test_s3_load_reraises_other_errors(fake_s3):
+    s3 = fake_s3([])
+    s3.get_error = "AccessDenied"
+    store = BookStore("tests/books.json")
+    with pytest.raises(botocore.exceptions.ClientError) as error:
+        asyncio.run(store._load_books())
+    assert error.value.response["Error"]["Code"] == "AccessDenied"
+
+def test_s3_write_reraises_precondition_failed(fake_s3):
+    fake_s3([])
+    store = BookStore("tests/books.json")
+    store._etag = '"stale"'
+    with pytest.raises(botocore.exceptions.ClientError) as error:
+        asyncio.run(store._write_books(b"[]"))
+    assert error.value.response["Error"]["Code"] == "PreconditionFailed"
+    assert store._etag == '"stale"'
+
+def test_s3_conflict_reloads_and_retries_with_new_etag(fake_s3):
+    remote = Book(name="Remote", genre="drama", price=5.0)
+    other = Book(name="Other", genre="comedy", price=7.0)
+    s3 = fake_s3([remote])
+
+    async def run():
+        store = await BookStore.create("tests/books.json")
+        s3.replace([remote, other])
+        await store.add_book(Book(name="Local", genre="fiction", price=10.0))
+        await store.flush()
+        return store
+
+    store = asyncio.run(run())
+    assert s3.puts == [{"IfMatch": '"v0"'}, {"IfMatch": '"other-0"'}]
+    assert [book["name"] for book in orjson.loads(s3.body)] == ["Remote", "Other", "Local"]
+    assert store._etag == s3.etag
+
+# Test cases for flushing changes to S3
+def test_flush_retries_after_conflict_without_losing_changes():
+    store = BookStore("tests/books.json")
+    remote = Book(name="Remote", genre="drama", price=5.0)
+    local = Book(name="Local", genre="fiction", price=10.0)
+    late = Book(name="Late", genre="comedy", price=7.0)
+    written = []
+
+    async def write_books(body):
+        written.append(orjson.loads(body))
+        if len(written) == 1:
+            raise botocore.exceptions.ClientError({"Error": {"Code": "PreconditionFailed"}}, "PutObject")
+
+    async def load_books():
+        # A change that lands while the conflicting file is being reloaded
+        await store.add_book(late)
+        return {remote.book_id: remote}
+
+    store._write_books = write_books
+    store._load_books = load_books
+
+    async def run():
+        await store.add_book(local)
+        await store.flush()
+
+    asyncio.run(run())
+    assert len(written) == 2
+    assert [book["name"] for book in written[-1]] == ["Remote", "Local", "Late"]
+    assert list(store.books) == [remote.book_id, local.book_id, late.book_id]
+    assert store._pending == []
+
+def test_delayed_flush_batches_changes(monkeypatch):
+    monkeypatch.setattr(fast_api_sample, "FLUSH_DELAY", 0)
+    store = BookStore("tests/books.json")
+    written = []
+
+    async def write_books(body):
+        written.append(orjson.loads(body))
+        if len(written) == 1:
+            # A change made while the upload is in flight gets its own flush
+            await store.add_book(Book(name="Book 3", genre="drama", price=20.0))
+
+    store._write_books = write_books
+
+    async def run():
+        await store.add_book(Book(name="Book 1", genre="fiction", price=10.0))
+        await store.add_book(Book(name="Book 2", genre="romance", price=15.0))
+        await store._flush_task
+
+    asyncio.run(run())
+    assert [len(books) for books in written] == [2, 3]
+    assert store._pending == []
+
 # Test cases for random_book
-def test_random_book():
-    bookstore.add_book(Book(name="Book 1", genre="fiction", price=10.0))
-    bookstore.add_book(Book(name="Book 2", genre="romance", price=15.0))
+def test_random_book(monkeypatch):
+    # A store of its own, since the shared one also holds books renamed by the update tests
+    store = BookStore("tests/books.json")
+    monkeypatch.setitem(app.dependency_overrides, get_bookstore, lambda: store)
+    asyncio.run(store.add_book(Book(name="Book 1", genre="fiction", price=10.0)))
+    asyncio.run(store.add_book(Book(name="Book 2", genre="romance", price=15.0)))
     response = client.get("/random-book")
     assert response.status_code == 200
     assert response.json()["name"] in ["Book 1", "Book 2"]
@@ -108,4 +361,172 @@ def test_hello_world():
 def test_root():
     response = client.get("/")
     assert response.status_code == 200
-    assert response.json() == {"messages": "Welcome to the bookstore"}
\ No newline at end of file
+    assert response.json() == {"messages": "Welcome to the bookstore"}
+
+# Test cases for DynamoBookStore, against an in-memory stand-in for the table
+class FakeTable:
+    def __init__(self, page_size=2):
+        self.items = {}
+        self.page_size = page_size
+        self.get_calls = 0
+        self.on_write = None
+
+    async def scan(self, ExclusiveStartKey=None):
+        keys = list(self.items)
+        start = keys.index(ExclusiveStartKey["book_id"]) + 1 if ExclusiveStartKey else 0
+        page = keys[start:start + self.page_size]
+        response = {"Items": [dict(self.items[key]) for key in page]}
+        if start + self.page_size < len(keys):
+            response["LastEvaluatedKey"] = {"book_id": page[-1]}
+        return response
+
+    async def get_item(self, Key):
+        self.get_calls += 1
+        item = self.items.get(Key["book_id"])
+        return {"Item": dict(item)} if item else {}
+
+    async def _write(self, book_id, condition):
+        if self.on_write is not None:
+            await self.on_write()
+        if (condition == "attribute_exists(book_id)") != (book_id in self.items):
+            raise botocore.exceptions.ClientError({"Error": {"Code": "ConditionalCheckFailedException"}}, "PutItem")
+
+    async def put_item(self, Item, ConditionExpression):
+        await self._write(Item["book_id"], ConditionExpression)
+        self.items[Item["book_id"]] = Item
+
+    async def delete_item(self, Key, ConditionExpression):
+        await self._write(Key["book_id"], ConditionExpression)
+        del self.items[Key["book_id"]]
+
+def make_dynamo_store(page_size=2):
+    store = DynamoBookStore("Books")
+    store._table = FakeTable(page_size)
+    return store
+
+async def collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+def make_redis_store(page_size=2):
+    fakeredis = pytest.importorskip("fakeredis")
+    store = RedisBookStore("redis://localhost:6379/0")
+    store._r = fakeredis.FakeAsyncRedis(server=fakeredis.FakeServer(), decode_responses=True)
+    store.PAGE_SIZE = page_size
+    return store
+
+# Test cases shared by the stores that keep one entry per book
+@pytest.fixture(params=["dynamodb", "redis"])
+def item_store(request):
+    if request.param == "dynamodb":
+        return make_dynamo_store(page_size=2)
+    return make_redis_store(page_size=2)
+
+def test_item_store_lists_pages_in_order(item_store):
+    async def run():
+        for i in range(5):
+            await item_store.add_book(Book(name=f"Book {i}", genre="fiction", price=float(i)))
+        return (
+            await item_store.get_all_books(),
+            await collect(item_store.iter_serialized()),
+            await item_store.get_book_by_index(3),
+            await item_store.random_book(),
+        )
+
+    books, streamed, by_index, picked = asyncio.run(run())
+    names = [f"Book {i}" for i in range(5)]
+    assert [book.name for book in books] == names
+    assert [book["name"] for book in orjson.loads(streamed)] == names
+    assert by_index["name"] == "Book 3"
+    assert picked["name"] in names
+
+def test_item_store_iter_serialized_empty(item_store):
+    assert orjson.loads(asyncio.run(collect(item_store.iter_serialized()))) == []
+
+def test_item_store_add_update_delete(item_store):
+    book = Book(name="Book 1", genre="fiction", price=10.0)
+
+    async def run():
+        await item_store.add_book(book)
+        updated = await item_store.update_book(book.book_id, Book(name="Book 1", genre="fiction", price=12.5))
+        fetched = await item_store.get_book_by_id(book.book_id)
+        await item_store.delete_book(book.book_id)
+        return updated, fetched, await item_store.get_all_books()
+
+    updated, fetched, remaining = asyncio.run(run())
+    assert updated["book"]["book_id"] == book.book_id
+    assert fetched["price"] == 12.5
+    assert remaining == []
+
+def test_item_store_missing_and_duplicate_books_map_to_http_errors(item_store):
+    book = Book(name="Book 1", genre="fiction", price=10.0)
+
+    async def run():
+        await item_store.add_book(book)
+        statuses = []
+        for call in [
+            lambda: item_store.add_book(book),
+            lambda: item_store.update_book("missing", book),
+            lambda: item_store.delete_book("missing"),
+            lambda: item_store.get_book_by_id("missing"),
+            lambda: item_store.get_book_by_index(5),
+        ]:
+            with pytest.raises(HTTPException) as error:
+                await call()
+            statuses.append(error.value.status_code)
+        return statuses
+
+    assert asyncio.run(run()) == [409, 404, 404, 404, 404]
+
+def test_item_store_random_book_empty(item_store):
+    with pytest.raises(HTTPException) as error:
+        asyncio.run(item_store.random_book())
+    assert error.value.status_code == 404
+
+# Test cases specific to DynamoBookStore
+def test_dynamo_read_cache_hit_and_eviction():
+    store = make_dynamo_store()
+    book = Book(name="Book 1", genre="fiction", price=10.0)
+
+    async def run():
+        await store.add_book(book)
+        await store.get_book_by_id(book.book_id)
+        await store.get_book_by_id(book.book_id)
+        assert store._table.get_calls == 1
+        await store.update_book(book.book_id, Book(name="Book 1", genre="fiction", price=12.5))
+        assert (await store.get_book_by_id(book.book_id))["price"] == 12.5
+        await store.delete_book(book.book_id)
+        with pytest.raises(HTTPException):
+            await store.get_book_by_id(book.book_id)
+
+    asyncio.run(run())
+
+def test_dynamo_read_during_write_is_not_cached():
+    store = make_dynamo_store()
+    book = Book(name="Book 1", genre="fiction", price=10.0)
+
+    async def run():
+        await store.add_book(book)
+
+        async def read_during_write():
+            await store.get_book_by_id(book.book_id)
+
+        store._table.on_write = read_during_write
+        await store.update_book(book.book_id, Book(name="Book 1", genre="fiction", price=12.5))
+        await store.delete_book(book.book_id)
+        store._table.on_write = None
+        with pytest.raises(HTTPException):
+            await store.get_book_by_id(book.book_id)
+
+    asyncio.run(run())
+
+# Test cases specific to RedisBookStore
+def test_redis_failed_update_leaves_no_hash():
+    store = make_redis_store()
+    book = Book(name="Book 1", genre="fiction", price=10.0)
+
+    async def run():
+        with pytest.raises(HTTPException):
+            await store.update_book("missing", book)
+        return await store._r.exists("book:missing")
+
+    assert not asyncio.run(run())